@@ -15,8 +15,11 @@
 """
 Usage: ./check_flink_services_health.py [options]
 """
-import datetime
 import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
 from typing import Sequence
 from typing import Tuple
 
@@ -36,26 +39,33 @@ from paasta_tools.utils import is_under_replicated
 
 log = logging.getLogger(__name__)
 
+# A pod has to be running this long before it counts as healthy.
+MIN_POD_LIFETIME_S = 60
 
-def container_lifetime(pod: V1Pod,) -> datetime.timedelta:
-    """Return a time duration for how long the pod is alive
+
+def healthy_flink_containers_per_type(si_pods: Sequence[V1Pod]) -> Dict[str, int]:
+    """Return counts of healthy Flink containers keyed by container type,
+    computed in a single pass over the pods
     """
-    st = pod.status.start_time
-    return datetime.datetime.now(st.tzinfo) - st
+    counts: Dict[str, int] = defaultdict(int)
+    # Compare epoch floats against a cutoff computed once, instead of
+    # building a timezone-aware timedelta per pod.
+    min_start_ts = time.time() - MIN_POD_LIFETIME_S
+    for pod in si_pods:
+        container_type = pod.metadata.labels.get("flink-container-type")
+        if (
+            container_type is not None
+            and is_pod_ready(pod)
+            and pod.status.start_time.timestamp() < min_start_ts
+        ):
+            counts[container_type] += 1
+    return counts
 
 
 def healthy_flink_containers_cnt(si_pods: Sequence[V1Pod], container_type: str) -> int:
     """Return count of healthy Flink containers with given type
     """
-    return len(
-        [
-            pod
-            for pod in si_pods
-            if pod.metadata.labels["flink-container-type"] == container_type
-            and is_pod_ready(pod)
-            and container_lifetime(pod).total_seconds() > 60
-        ]
-    )
+    return healthy_flink_containers_per_type(si_pods)[container_type]
 
 
 def check_under_registered_taskmanagers(
@@ -65,6 +75,12 @@ def check_under_registered_taskmanagers(
     returns both the result of the check in the form of a boolean and a human-readable
     text to be used in logging or monitoring events.
     """
+    if expected_count == 0:
+        return (
+            False,
+            f"Service {instance_config.job_id} expects no taskmanagers; "
+            f"skipping dashboard check",
+        )
     unhealthy = True
     try:
         overview = flink_tools.get_flink_jobmanager_overview(
@@ -118,35 +134,59 @@ def check_flink_service_health(
     taskmanagers_expected_cnt = instance_config.config_dict.get(
         "taskmanager", {"instances": 10}
     ).get("instances", 10)
-    num_healthy_supervisors = healthy_flink_containers_cnt(si_pods, "supervisor")
-    num_healthy_jobmanagers = healthy_flink_containers_cnt(si_pods, "jobmanager")
-    num_healthy_taskmanagers = healthy_flink_containers_cnt(si_pods, "taskmanager")
-
-    results = [
-        check_under_replication(
-            instance_config=instance_config,
-            expected_count=1,
-            num_available=num_healthy_supervisors,
-            sub_component="supervisor",
-        ),
-        check_under_replication(
-            instance_config=instance_config,
-            expected_count=1,
-            num_available=num_healthy_jobmanagers,
-            sub_component="jobmanager",
-        ),
-        check_under_replication(
-            instance_config=instance_config,
-            expected_count=taskmanagers_expected_cnt,
-            num_available=num_healthy_taskmanagers,
-            sub_component="taskmanager",
-        ),
-        check_under_registered_taskmanagers(
-            instance_config=instance_config, expected_count=taskmanagers_expected_cnt,
-        ),
-    ]
-    output = "\n########\n".join([r[1] for r in results])
-    if any(r[0] for r in results):
+    healthy_count = healthy_flink_containers_per_type(si_pods)
+    num_healthy_supervisors = healthy_count["supervisor"]
+    num_healthy_jobmanagers = healthy_count["jobmanager"]
+    num_healthy_taskmanagers = healthy_count["taskmanager"]
+
+    # The dashboard check hits the jobmanager over HTTP, so run all four
+    # checks concurrently to keep that round-trip off the critical path.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(
+                check_under_replication,
+                instance_config=instance_config,
+                expected_count=1,
+                num_available=num_healthy_supervisors,
+                sub_component="supervisor",
+            ),
+            executor.submit(
+                check_under_replication,
+                instance_config=instance_config,
+                expected_count=1,
+                num_available=num_healthy_jobmanagers,
+                sub_component="jobmanager",
+            ),
+            executor.submit(
+                check_under_replication,
+                instance_config=instance_config,
+                expected_count=taskmanagers_expected_cnt,
+                num_available=num_healthy_taskmanagers,
+                sub_component="taskmanager",
+            ),
+        ]
+        # Without a healthy jobmanager the dashboard can't be serving, so
+        # don't spend the HTTP timeout discovering that.
+        if num_healthy_jobmanagers > 0:
+            futures.append(
+                executor.submit(
+                    check_under_registered_taskmanagers,
+                    instance_config=instance_config,
+                    expected_count=taskmanagers_expected_cnt,
+                )
+            )
+        results = [f.result() for f in futures]
+    if num_healthy_jobmanagers == 0:
+        results.append(
+            (
+                True,
+                f"Service {instance_config.job_id} has no healthy jobmanager; "
+                f"skipping dashboard check",
+            )
+        )
+    unhealthy_flags, outputs = zip(*results)
+    output = "\n########\n".join(outputs)
+    if any(unhealthy_flags):
         log.error(output)
         status = pysensu_yelp.Status.CRITICAL
     else:
@@ -155,7 +155,9 @@ def cleanup_apps(soa_dir, kill_threshold=0.5, force=False):
         marathon_tools.get_marathon_servers(system_paasta_config)
     )
 
-    valid_services = get_services_for_cluster(instance_type="marathon", soa_dir=soa_dir)
+    valid_services = set(
+        get_services_for_cluster(instance_type="marathon", soa_dir=soa_dir)
+    )
     all_apps_with_clients = marathon_tools.get_marathon_apps_with_clients(
         clients.get_all_clients()
     )
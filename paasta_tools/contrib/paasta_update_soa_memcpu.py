@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 import argparse
-import contextlib
-import json
 import os
 import subprocess
 import tempfile
 import time
+from functools import lru_cache
 
-import requests
-import ruamel.yaml as yaml
-from jira.client import JIRA
+import orjson
+
+# requests, ruamel.yaml and jira are all slow imports and only needed on
+# particular paths, so they are imported lazily where they are used to
+# keep --help and argument errors snappy.
 
 
 def parse_args(argv):
@@ -59,24 +60,9 @@ def tempdir():
     return tempfile.TemporaryDirectory(prefix="repo", dir="/nail/tmp")
 
 
-@contextlib.contextmanager
-def cwd(path):
-    pwd = os.getcwd()
-    os.chdir(path)
-    try:
-        yield
-    finally:
-        os.chdir(pwd)
-
-
-@contextlib.contextmanager
-def in_tempdir():
-    with tempdir() as tmp:
-        with cwd(tmp):
-            yield
-
-
 def get_perf_data(creds, filename):
+    import requests
+
     url = "https://splunk-api.yelpcorp.com/servicesNS/nobody/yelp_performance/search/jobs/export"
     search = (
         "| inputlookup {} |"
@@ -84,48 +70,85 @@ def get_perf_data(creds, filename):
     ).format(filename)
     data = {"output_mode": "json", "search": search}
     creds = creds.split(":")
-    resp = requests.post(url, data=data, auth=(creds[0], creds[1]))
-    resp_text = resp.text.split("\n")
-    resp_text = [x for x in resp_text if x]
-    resp_text = [json.loads(x) for x in resp_text]
 
     services_to_update = []
-    for d in resp_text:
-        criteria = d["result"]["criteria"].split()
-        serv = {}
-        serv["service"] = criteria[0]
-        serv["cluster"] = criteria[1]
-        serv["instance"] = criteria[2]
-        serv["cpus"] = d["result"]["suggested_cpus"]
-        serv["owner"] = d["result"]["service_owner"]
-        serv["money"] = d["result"]["estimated_monthly_savings"]
-        serv["date"] = d["result"]["_time"].split(" ")[0]
-        serv["old_cpus"] = d["result"]["current_cpus"]
-        serv["project"] = d["result"]["project"]
-        services_to_update.append(serv)
+    seen_criteria = set()
+    with requests.post(
+        url, data=data, auth=(creds[0], creds[1]), stream=True
+    ) as resp:
+        for line in resp.iter_lines(decode_unicode=False, chunk_size=65536):
+            if not line:
+                continue
+            result = orjson.loads(line)["result"]
+            criteria = result["criteria"]
+            if criteria in seen_criteria:
+                continue
+            seen_criteria.add(criteria)
+            svc, cluster, instance = criteria.split(" ", 2)
+            services_to_update.append(
+                {
+                    "service": svc,
+                    "cluster": cluster,
+                    "instance": instance,
+                    "cpus": result["suggested_cpus"],
+                    "owner": result["service_owner"],
+                    "money": result["estimated_monthly_savings"],
+                    "date": result["_time"].split(" ")[0],
+                    "old_cpus": result["current_cpus"],
+                    "project": result["project"],
+                }
+            )
 
     return services_to_update
 
 
-def clone(branch_name):
+# The script spawns many short-lived git/rbt processes and never holds
+# sensitive file descriptors, so skip the close-all-fds walk on each fork.
+def clone(repo_dir):
+    """Clone yelpsoa-configs into repo_dir and return its default branch name."""
     remote = "git@sysgit.yelpcorp.com:yelpsoa-configs"
-    subprocess.check_call(("git", "clone", remote, "."))
-    subprocess.check_call(("git", "checkout", "-b", branch_name))
+    subprocess.check_call(("git", "clone", remote, "."), cwd=repo_dir, close_fds=False)
+    return (
+        subprocess.check_output(
+            ("git", "rev-parse", "--abbrev-ref", "HEAD"), cwd=repo_dir, close_fds=False
+        )
+        .decode("UTF-8")
+        .strip()
+    )
 
 
-def commit(filename, serv):
+def checkout_new_branch(branch_name, base_branch, repo_dir):
+    # -f discards any leftovers from a service whose review failed partway.
+    subprocess.check_call(
+        ("git", "checkout", "-f", base_branch), cwd=repo_dir, close_fds=False
+    )
+    subprocess.check_call(
+        ("git", "checkout", "-b", branch_name), cwd=repo_dir, close_fds=False
+    )
+
+
+def commit(filename, serv, repo_dir):
     message = "Updating {} for {}provisioned cpu from {} to {} cpus".format(
         filename, serv["state"], serv["old_cpus"], serv["cpus"]
     )
-    subprocess.check_call(("git", "add", filename))
-    subprocess.check_call(("git", "commit", "-n", "-m", message))
+    # Committing the pathspec directly stages the modification as part of
+    # the same git process, saving a separate `git add` per service.
+    subprocess.check_call(
+        ("git", "commit", "-n", "-m", message, "--", filename),
+        cwd=repo_dir,
+        close_fds=False,
+    )
 
 
+@lru_cache()
 def get_reviewers_in_group(group_name):
     """Using rbt's target-groups argument overrides our configured default review groups.
     So we'll expand the group into usernames and pass those users in the group individually.
+
+    Group membership doesn't change within a run, so cache the rbt call
+    instead of re-querying reviewboard for every service.
     """
-    rightsizer_reviewers = json.loads(
+    rightsizer_reviewers = orjson.loads(
         subprocess.check_output(
             (
                 "rbt",
@@ -133,16 +156,25 @@ def get_reviewers_in_group(group_name):
                 "--server",
                 "https://reviewboard.yelpcorp.com",
                 f"groups/{group_name}/users/",
-            )
-        ).decode("UTF-8")
+            ),
+            close_fds=False,
+        )
     )
     return [user.get("username", "") for user in rightsizer_reviewers.get("users", {})]
 
 
-def get_reviewers(filename):
+@lru_cache()
+def get_reviewers(filename, repo_dir):
     recent_authors = set()
+    # We only keep the three most recent authors, so there's no point
+    # walking the file's entire history; a repeated filename (e.g. several
+    # instances in one cluster file) hits the cache instead of git.
     authors = (
-        subprocess.check_output(("git", "log", "--format=%ae", "--", filename))
+        subprocess.check_output(
+            ("git", "log", "-50", "--format=%ae", "--", filename),
+            cwd=repo_dir,
+            close_fds=False,
+        )
         .decode("UTF-8")
         .splitlines()
     )
@@ -155,8 +187,10 @@ def get_reviewers(filename):
     return recent_authors
 
 
-def review(filename, summary, description, manual_rb):
-    all_reviewers = get_reviewers(filename).union(get_reviewers_in_group("right-sizer"))
+def review(filename, summary, description, manual_rb, repo_dir):
+    all_reviewers = get_reviewers(filename, repo_dir).union(
+        get_reviewers_in_group("right-sizer")
+    )
     reviewers_arg = " ".join(all_reviewers)
     if manual_rb:
         subprocess.check_call(
@@ -168,7 +202,9 @@ def review(filename, summary, description, manual_rb):
                 reviewers_arg,
                 "--server",
                 "https://reviewboard.yelpcorp.com",
-            )
+            ),
+            cwd=repo_dir,
+            close_fds=False,
         )
     else:
         subprocess.check_call(
@@ -181,25 +217,64 @@ def review(filename, summary, description, manual_rb):
                 reviewers_arg,
                 "--server",
                 "https://reviewboard.yelpcorp.com",
-            )
+            ),
+            cwd=repo_dir,
+            close_fds=False,
         )
 
 
-def edit_soa_configs(filename, instance, cpu):
+@lru_cache()
+def _get_yaml():
+    """Build the round-trip YAML instance on first use and reuse it for
+    every subsequent edit, rather than rebuilding the loader/dumper
+    machinery per call."""
+    import ruamel.yaml
+
+    yml = ruamel.yaml.YAML(typ="rt")
+    yml.preserve_quotes = True
+    yml.width = 120
+    return yml
+
+
+def current_cpus_match(filename, instance, cpu):
+    """Cheaply check whether the instance already carries the suggested cpus
+    value, so the caller can bail out before filing a ticket or cutting a
+    branch for a no-op."""
+    yml = _get_yaml()
     with open(filename, "r") as fi:
         yams = fi.read()
+    yams = yams.replace("cpus: .", "cpus: 0.")
+    data = yml.load(yams)
+    return data[instance].get("cpus") == cpu
+
+
+def edit_soa_configs(filename, instance, cpu):
+    """Update the instance's cpus value in place. Returns True if the file
+    was rewritten, False if the suggestion was already applied."""
+    yml = _get_yaml()
+    # Open once in r+ mode rather than re-opening the same path for the
+    # write-back, which repeats the directory lookup.
+    with open(filename, "r+") as fi:
+        yams = fi.read()
         yams = yams.replace("cpus: .", "cpus: 0.")
-        data = yaml.round_trip_load(yams, preserve_quotes=True)
+        data = yml.load(yams)
 
-    instdict = data[instance]
-    instdict["cpus"] = cpu
-    out = yaml.round_trip_dump(data, width=120)
+        instdict = data[instance]
+        if instdict.get("cpus") == cpu:
+            # The suggestion is already applied (e.g. a re-run over the same
+            # report); skip the rewrite so we don't churn an identical file.
+            return False
+        instdict["cpus"] = cpu
 
-    with open(filename, "w") as fi:
-        fi.write(out)
+        fi.seek(0)
+        yml.dump(data, fi)
+        fi.truncate()
+    return True
 
 
 def create_jira_ticket(serv, creds, description):
+    from jira.client import JIRA
+
     creds = creds.split(":")
     options = {"server": "https://jira.yelpcorp.com"}
     jira_cli = JIRA(options=options, basic_auth=(creds[0], creds[1]))
@@ -231,61 +306,99 @@ def _get_dashboard_qs_param(param, value):
     return f"variables%5B%5D={param}%3D{param}:{value}"
 
 
+# Built once instead of re-concatenating the literal for every service.
+TICKET_DESC_TEMPLATE = (
+    "This ticket and CR have been auto-generated to help keep PaaSTA right-sized."
+    "\nPEOBS will review this CR and give a shipit. Then an ops deputy from your team can merge"
+    " if these values look good for your service after review."
+    "\nOpen an issue with any concerns and someone from PEOBS will respond."
+    "\nWe suspect that {s}.{i} in {c} may have been {o}-provisioned"
+    " during the 1 week prior to {d}. It initially had {x} cpus, but based on the below dashboard,"
+    " we recommend {y} cpus."
+    "\n- Dashboard: https://y.yelpcorp.com/{o}provisioned?{cluster_param}&{service_param}&{instance_param}"
+    "\n- Service owner: {n}"
+    "\n- Estimated monthly excess cost: ${m}"
+    "\n\nFor more information and sizing examples for larger services:"
+    "\n- Runbook: https://y.yelpcorp.com/rb-provisioning-alert"
+    "\n- Alert owner: pe-observability@yelp.com"
+)
+
+
 def main(argv=None):
     args = parse_args(argv)
     services_to_update = get_perf_data(args.splunk_creds, args.file_splunk)
 
-    for serv in services_to_update:
-        filename = "{}/{}.yaml".format(serv["service"], serv["cluster"])
-        cpus = float(serv["cpus"])
-        provisioned_state = "over"
-        if cpus > float(serv["old_cpus"]):
-            provisioned_state = "under"
-
-        serv["state"] = provisioned_state
-        ticket_desc = (
-            "This ticket and CR have been auto-generated to help keep PaaSTA right-sized."
-            "\nPEOBS will review this CR and give a shipit. Then an ops deputy from your team can merge"
-            " if these values look good for your service after review."
-            "\nOpen an issue with any concerns and someone from PEOBS will respond."
-            "\nWe suspect that {s}.{i} in {c} may have been {o}-provisioned"
-            " during the 1 week prior to {d}. It initially had {x} cpus, but based on the below dashboard,"
-            " we recommend {y} cpus."
-            "\n- Dashboard: https://y.yelpcorp.com/{o}provisioned?{cluster_param}&{service_param}&{instance_param}"
-            "\n- Service owner: {n}"
-            "\n- Estimated monthly excess cost: ${m}"
-            "\n\nFor more information and sizing examples for larger services:"
-            "\n- Runbook: https://y.yelpcorp.com/rb-provisioning-alert"
-            "\n- Alert owner: pe-observability@yelp.com"
-        ).format(
-            s=serv["service"],
-            c=serv["cluster"],
-            i=serv["instance"],
-            o=provisioned_state,
-            d=serv["date"],
-            n=serv["owner"],
-            m=serv["money"],
-            x=serv["old_cpus"],
-            y=serv["cpus"],
-            cluster_param=_get_dashboard_qs_param(
-                "paasta_cluster", serv["cluster"].replace("marathon-", "")
-            ),
-            service_param=_get_dashboard_qs_param("paasta_service", serv["service"]),
-            instance_param=_get_dashboard_qs_param("paasta_instance", serv["instance"]),
-        )
-        summary = f"Rightsizing {serv['service']}.{serv['instance']} in {serv['cluster']} to make it not have {provisioned_state}-provisioned cpu"  # noqa: E501
-        branch = ""
-        if args.no_tick:
-            branch = "rightsize-{}".format(int(time.time()))
-        else:
-            branch = create_jira_ticket(serv, args.jira_creds, ticket_desc)
-
-        with in_tempdir():
-            clone(branch)
-            edit_soa_configs(filename, serv["instance"], cpus)
+    # Clone yelpsoa-configs once and cut a branch per service off the same
+    # checkout; every git call gets cwd=repo_dir rather than os.chdir'ing
+    # the whole process into the tempdir.
+    with tempdir() as repo_dir:
+        base_branch = clone(repo_dir)
+        for serv in services_to_update:
+            filename = "{}/{}.yaml".format(serv["service"], serv["cluster"])
+            cpus = float(serv["cpus"])
+            # Probe the config before doing any real work: an
+            # already-right-sized service shouldn't get a JIRA ticket or a
+            # branch, just a note that there is nothing to do.
+            if current_cpus_match(
+                os.path.join(repo_dir, filename), serv["instance"], cpus
+            ):
+                print(
+                    "\n{f}: {i} is already at {y} cpus, skipping.".format(
+                        f=filename, i=serv["instance"], y=cpus
+                    )
+                )
+                continue
+            provisioned_state = "over"
+            if cpus > float(serv["old_cpus"]):
+                provisioned_state = "under"
+
+            serv["state"] = provisioned_state
+            ticket_desc = TICKET_DESC_TEMPLATE.format(
+                s=serv["service"],
+                c=serv["cluster"],
+                i=serv["instance"],
+                o=provisioned_state,
+                d=serv["date"],
+                n=serv["owner"],
+                m=serv["money"],
+                x=serv["old_cpus"],
+                y=serv["cpus"],
+                cluster_param=_get_dashboard_qs_param(
+                    "paasta_cluster", serv["cluster"].replace("marathon-", "")
+                ),
+                service_param=_get_dashboard_qs_param(
+                    "paasta_service", serv["service"]
+                ),
+                instance_param=_get_dashboard_qs_param(
+                    "paasta_instance", serv["instance"]
+                ),
+            )
+            summary = f"Rightsizing {serv['service']}.{serv['instance']} in {serv['cluster']} to make it not have {provisioned_state}-provisioned cpu"  # noqa: E501
+            branch = ""
+            if args.no_tick:
+                # Include service, cluster and instance so names stay unique
+                # within the shared clone even for rows processed the same
+                # second; the same service.instance recurs across clusters.
+                branch = "rightsize-{}-{}-{}-{}".format(
+                    serv["service"], serv["cluster"], serv["instance"], int(time.time())
+                )
+            else:
+                branch = create_jira_ticket(serv, args.jira_creds, ticket_desc)
+
+            checkout_new_branch(branch, base_branch, repo_dir)
+            changed = edit_soa_configs(
+                os.path.join(repo_dir, filename), serv["instance"], cpus
+            )
+            if not changed:
+                print(
+                    "\n{f}: {i} is already at {y} cpus, skipping.".format(
+                        f=filename, i=serv["instance"], y=cpus
+                    )
+                )
+                continue
             try:
-                commit(filename, serv)
-                review(filename, summary, ticket_desc, args.manual_rb)
+                commit(filename, serv, repo_dir)
+                review(filename, summary, ticket_desc, args.manual_rb, repo_dir)
             except Exception:
                 print(
                     (
@@ -34,6 +34,10 @@ from paasta_tools.utils import load_v2_deployments_json
 FLINK_INGRESS_PORT = 31080
 FLINK_DASHBOARD_TIMEOUT_SECONDS = 5
 
+# Shared session so repeated dashboard requests within a run reuse the
+# underlying connection pool instead of opening a new connection each time.
+_dashboard_session = requests.Session()
+
 
 class TaskManagerConfig(TypedDict, total=False):
     instances: int
@@ -175,7 +179,7 @@ def _dashboard_get(service: str, instance: str, cluster: str, path: str) -> str:
     root = get_flink_ingress_url_root(cluster)
     name = sanitised_cr_name(service, instance)
     url = f"{root}{name}/{path}"
-    response = requests.get(url, timeout=FLINK_DASHBOARD_TIMEOUT_SECONDS)
+    response = _dashboard_session.get(url, timeout=FLINK_DASHBOARD_TIMEOUT_SECONDS)
     response.raise_for_status()
     return response.text
 
@@ -79,6 +79,22 @@ def test_check_under_registered_taskmanagers_under(mock_overview, instance_confi
     )
 
 
+@mock.patch(
+    "paasta_tools.flink_tools.get_flink_jobmanager_overview",
+    autospec=True,
+    return_value={"taskmanagers": 0},
+)
+def test_check_under_registered_taskmanagers_none_expected(
+    mock_overview, instance_config
+):
+    under, output = check_under_registered_taskmanagers(
+        instance_config, expected_count=0
+    )
+    assert not under
+    assert "expects no taskmanagers" in output
+    assert not mock_overview.called
+
+
 @mock.patch(
     "paasta_tools.flink_tools.get_flink_jobmanager_overview",
     autospec=True,
@@ -102,9 +118,9 @@ def test_check_under_registered_taskmanagers_error(mock_overview, instance_confi
 def test_check_flink_service_health_healthy(instance_config):
     all_pods = []
     with mock.patch(
-        "paasta_tools.check_flink_services_health.healthy_flink_containers_cnt",
+        "paasta_tools.check_flink_services_health.healthy_flink_containers_per_type",
         autospec=True,
-        return_value=1,
+        return_value={"supervisor": 1, "jobmanager": 1, "taskmanager": 1},
     ), mock.patch(
         "paasta_tools.check_flink_services_health.check_under_replication",
         autospec=True,
@@ -164,9 +180,9 @@ def test_check_flink_service_health_too_few_taskmanagers(instance_config):
 
     all_pods = []
     with mock.patch(
-        "paasta_tools.check_flink_services_health.healthy_flink_containers_cnt",
+        "paasta_tools.check_flink_services_health.healthy_flink_containers_per_type",
         autospec=True,
-        return_value=1,
+        return_value={"supervisor": 1, "jobmanager": 1, "taskmanager": 1},
     ), mock.patch(
         "paasta_tools.check_flink_services_health.check_under_registered_taskmanagers",
         autospec=True,
@@ -218,9 +234,9 @@ def test_check_flink_service_health_too_few_taskmanagers(instance_config):
 def test_check_flink_service_health_under_registered_taskamanagers(instance_config):
     all_pods = []
     with mock.patch(
-        "paasta_tools.check_flink_services_health.healthy_flink_containers_cnt",
+        "paasta_tools.check_flink_services_health.healthy_flink_containers_per_type",
         autospec=True,
-        return_value=1,
+        return_value={"supervisor": 1, "jobmanager": 1, "taskmanager": 1},
     ), mock.patch(
         "paasta_tools.check_flink_services_health.check_under_replication",
         autospec=True,
@@ -267,3 +283,38 @@ def test_check_flink_service_health_under_registered_taskamanagers(instance_conf
             status=pysensu_yelp.Status.CRITICAL,
             output="OK\n########\nOK\n########\nOK\n########\nNOPE",
         )
+
+
+def test_check_flink_service_health_jobmanager_down(instance_config):
+    all_pods = []
+    with mock.patch(
+        "paasta_tools.check_flink_services_health.healthy_flink_containers_per_type",
+        autospec=True,
+        return_value={"supervisor": 1, "jobmanager": 0, "taskmanager": 1},
+    ), mock.patch(
+        "paasta_tools.check_flink_services_health.check_under_replication",
+        autospec=True,
+        return_value=(False, "OK"),
+    ), mock.patch(
+        "paasta_tools.check_flink_services_health.check_under_registered_taskmanagers",
+        autospec=True,
+        return_value=(False, "OK"),
+    ) as mock_check_under_registered_taskmanagers, mock.patch(
+        "paasta_tools.check_flink_services_health.send_replication_event", autospec=True
+    ) as mock_send_replication_event:
+        instance_config.config_dict["taskmanager"] = {"instances": 3}
+        check_flink_services_health.check_flink_service_health(
+            instance_config=instance_config,
+            all_pods=all_pods,
+            smartstack_replication_checker=None,
+        )
+        assert not mock_check_under_registered_taskmanagers.called
+        mock_send_replication_event.assert_called_once_with(
+            instance_config=instance_config,
+            status=pysensu_yelp.Status.CRITICAL,
+            output=(
+                "OK\n########\nOK\n########\nOK\n########\n"
+                "Service fake_service.fake_instance has no healthy jobmanager; "
+                "skipping dashboard check"
+            ),
+        )